@@ -47,6 +47,8 @@ architecture architecture_delay of delay is
 
     -- TEST interface
     signal test_read_data_int : std_logic_vector(31 downto 0);
+    -- live registers and their copy latched on a snapshot
+    signal test_live, test_snap : test_array(0 to 2)(TEST_DATA_WIDTH-1 downto 0);
 
 begin
 
@@ -76,19 +78,96 @@ begin
     -- Test interface
     test_sdo.data_rd <= test_read_data_int when test_sdi.sel = test_sel_addr else (others => 'Z');
 
-    TEST_PROC : process(test_sdi.addr)
+    test_live(0) <= std_logic_vector(resize(cnt, TEST_DATA_WIDTH));
+    test_live(1) <= std_logic_vector(to_unsigned(CNT_MAX, TEST_DATA_WIDTH));
+    test_live(2) <= (others => fire);
+
+    TEST_SNAP_PROC : process(clk)
+    begin
+        if rising_edge(clk) then
+            if test_sdi.snap = '1' then
+                test_snap <= test_live;
+            end if;
+        end if;
+    end process;
+
+    test_read_data_int <= test_mux(test_live, test_snap, test_sdi);
+
+    
+end architecture_delay;
+
+library IEEE;
+
+use IEEE.std_logic_1164.all;
+use IEEE.numeric_std.all;
+
+library lib_debug2uart;
+use lib_debug2uart.interface_pkg.all;
+use lib_debug2uart.arith_pkg.log2n;
+
+-- Ring buffer of samples, readable as block memory over the test interface
+entity sample_buffer is
+    generic (
+        DEPTH : natural := 1024
+    );
+    port (
+        clk   : in  std_logic;
+        reset : in  std_logic;
+        we    : in  std_logic;
+        din   : in  std_logic_vector(TEST_DATA_WIDTH-1 downto 0);
+        -- test interface
+        test_sel_addr : in  test_sel_addr;
+        test_sdi      : in  test_sdi;
+        test_sdo      : out test_sdo
+    );
+end sample_buffer;
+architecture architecture_sample_buffer of sample_buffer is
+    type ram_type is array(0 to DEPTH-1) of std_logic_vector(TEST_DATA_WIDTH-1 downto 0);
+    signal ram : ram_type;
+    signal wr_ptr : unsigned(log2n(DEPTH-1)-1 downto 0) := (others => '0');
+    signal ram_q : std_logic_vector(TEST_DATA_WIDTH-1 downto 0);
+
+    -- TEST interface
+    signal test_read_data_int : std_logic_vector(31 downto 0);
+begin
+
+    -- Simple dual port ram, registered read port for the test interface
+    RAM_PROC : process(clk)
+    begin
+        if rising_edge(clk) then
+            if we = '1' then
+                ram(to_integer(wr_ptr)) <= din;
+            end if;
+            ram_q <= ram(to_integer(unsigned(test_sdi.mem_addr(wr_ptr'range))));
+        end if;
+    end process;
+
+    PTR_PROC : process(clk)
+    begin
+        if rising_edge(clk) then
+            if reset = '1' then
+                wr_ptr <= (others => '0');
+            elsif we = '1' then
+                wr_ptr <= wr_ptr + 1;
+            end if;
+        end if;
+    end process;
+
+    -- Test interface: ram on block memory reads, registers otherwise
+    test_sdo.data_rd <= ram_q when test_sdi.sel = test_sel_addr and test_sdi.mem_rd = '1' else
+                        test_read_data_int when test_sdi.sel = test_sel_addr else (others => 'Z');
+
+    TEST_PROC : process(test_sdi.addr, wr_ptr)
     begin
         test_read_data_int <= (others => '0');
         case test_sdi.addr is
-            when x"00"  => test_read_data_int(cnt'left downto 0) <= std_logic_vector(cnt);
-            when x"01"  => test_read_data_int <= std_logic_vector(to_unsigned(CNT_MAX, test_read_data_int'length));
-            when x"02"  => test_read_data_int <= (others => fire);
+            when x"00"  => test_read_data_int(wr_ptr'left downto 0) <= std_logic_vector(wr_ptr);
+            when x"01"  => test_read_data_int <= std_logic_vector(to_unsigned(DEPTH, test_read_data_int'length));
             when others => test_read_data_int(7 downto 0) <= x"fe";
         end case;
     end process;
 
-    
-end architecture_delay;
+end architecture_sample_buffer;
 
 library IEEE;
 
@@ -101,12 +180,12 @@ library lib_debug2uart;
 use lib_debug2uart.all;
 use lib_debug2uart.interface_pkg.all;
 use lib_debug2uart.arith_pkg.log2n;
-use lib_debug2uart.debug2uart_register;
 use lib_debug2uart.bus2uart_core;
 
 entity top_level is
     generic (
-        CLK_FREQ : natural := 50e6
+        CLK_FREQ    : natural := 50e6;
+        SIM_BYTE_IF : boolean := false
     );
     port (
         clk     : in std_logic;
@@ -135,6 +214,7 @@ architecture behavior of top_level is
     signal test_sdi : test_sdi;
     signal test_sdo : test_sdo;
     signal test_read_data_int : std_logic_vector(31 downto 0);
+    signal test_live, test_snap : test_array(0 to 9)(TEST_DATA_WIDTH-1 downto 0);
 begin
     
 
@@ -154,6 +234,22 @@ begin
             test_sdo      => test_sdo
         );
 
+    -- Record counter 0 every ms
+    sample_buffer_i: entity work.sample_buffer
+        generic map (
+            DEPTH => 1024
+        )
+        port map (
+            clk   => clk,
+            reset => reset,
+            we    => cnt_clk,
+            din   => std_logic_vector(resize(counters(0), TEST_DATA_WIDTH)),
+            -- test interface
+            test_sel_addr => x"02",
+            test_sdi      => test_sdi,
+            test_sdo      => test_sdo
+        );
+
 
     FSM_PROC : process(clk, reset, cnt_clk)
     begin
@@ -188,29 +284,30 @@ begin
     -- Test interface
     test_sdo.data_rd <= test_read_data_int when test_sdi.sel = x"00" else (others => 'Z');
 
-    TEST_PROC : process(test_sdi.addr)
+    TEST_LIVE_GEN : for i in 0 to 7 generate
+        test_live(i) <= std_logic_vector(resize(counters(i), TEST_DATA_WIDTH));
+    end generate;
+    test_live(8) <= std_logic_vector(resize(unsigned(BTNs), TEST_DATA_WIDTH));
+    test_live(9) <= std_logic_vector(resize(unsigned(LEDs_int), TEST_DATA_WIDTH));
+
+    -- Latch all registers at once on a snapshot
+    TEST_SNAP_PROC : process(clk)
     begin
-        test_read_data_int <= (others => '0');
-        case test_sdi.addr is
-            when x"00"  => test_read_data_int(counters(0)'left downto 0) <= std_logic_vector(counters(0));
-            when x"01"  => test_read_data_int(counters(1)'left downto 0) <= std_logic_vector(counters(1));
-            when x"02"  => test_read_data_int(counters(2)'left downto 0) <= std_logic_vector(counters(2));
-            when x"03"  => test_read_data_int(counters(3)'left downto 0) <= std_logic_vector(counters(3));
-            when x"04"  => test_read_data_int(counters(4)'left downto 0) <= std_logic_vector(counters(4));
-            when x"05"  => test_read_data_int(counters(5)'left downto 0) <= std_logic_vector(counters(5));
-            when x"06"  => test_read_data_int(counters(6)'left downto 0) <= std_logic_vector(counters(6));
-            when x"07"  => test_read_data_int(counters(7)'left downto 0) <= std_logic_vector(counters(7));
-            when x"08"  => test_read_data_int(BTNs'left downto 0) <= BTNs;
-            when x"09"  => test_read_data_int(LEDs'left downto 0) <= LEDs;
-            when others => test_read_data_int(7 downto 0) <= x"fe";
-        end case;
+        if rising_edge(clk) then
+            if test_sdi.snap = '1' then
+                test_snap <= test_live;
+            end if;
+        end if;
     end process;
 
+    test_read_data_int <= test_mux(test_live, test_snap, test_sdi);
+
     
     TEST_I : entity lib_debug2uart.bus2uart_core
         generic map (
-            CLK_FREQ   => CLK_FREQ,
-            BAUD_RATE  => TEST_BAUDRATE
+            CLK_FREQ    => CLK_FREQ,
+            BAUD_RATE   => TEST_BAUDRATE,
+            SIM_BYTE_IF => SIM_BYTE_IF
         )
         port map (
             clk     => clk,
@@ -17,6 +17,8 @@ use work.interface_pkg.all;
 package arith_pkg is
     -- return log2 of a given integer (will be rounded up)
     function log2n(n : integer) return integer; 
+    -- crc-8 (polynomial x^8 + x^2 + x + 1) of crc updated with one byte
+    function crc8(crc : std_logic_vector(7 downto 0); data : std_logic_vector(7 downto 0)) return std_logic_vector;
 end package arith_pkg;
 
 package body arith_pkg is
@@ -32,4 +34,18 @@ package body arith_pkg is
         return 1;
     end function;
 
+    function crc8(crc : std_logic_vector(7 downto 0); data : std_logic_vector(7 downto 0)) return std_logic_vector is
+        variable c : std_logic_vector(7 downto 0);
+    begin
+        c := crc xor data;
+        for i in 0 to 7 loop
+            if c(7) = '1' then
+                c := (c(6 downto 0) & '0') xor x"07";
+            else
+                c := c(6 downto 0) & '0';
+            end if;
+        end loop;
+        return c;
+    end function;
+
 end arith_pkg;
\ No newline at end of file
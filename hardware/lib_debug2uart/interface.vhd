@@ -10,10 +10,15 @@
 
 library IEEE;
 use IEEE.std_logic_1164.all;
+use IEEE.numeric_std.all;
 package interface_pkg is
     constant TEST_DATA_WIDTH : natural := 32;
     constant TEST_SEL_WIDTH  : natural := 8;
     constant TEST_ADDR_WIDTH : natural := 8;
+    -- width of the free running cycle counter latched on a snapshot
+    constant TEST_CYCLE_WIDTH : natural := 64;
+    -- address width of block memory reads
+    constant TEST_MEM_ADDR_WIDTH : natural := 24;
 
     -- array of a particular size of slv of a different size
     type test_array is array(natural range <>) of std_logic_vector;
@@ -24,9 +29,37 @@ package interface_pkg is
         sel      : test_sel_addr;
         addr     : std_logic_vector(TEST_ADDR_WIDTH-1 downto 0);
         data_wr  : std_logic_vector(TEST_DATA_WIDTH-1 downto 0);
+        -- latch all registers (one clock cycle)
+        snap     : std_logic;
+        -- read from the latched copy instead of the live value
+        snap_rd  : std_logic;
+        -- block memory read: data_rd is the ram read port at mem_addr
+        mem_rd   : std_logic;
+        mem_addr : std_logic_vector(TEST_MEM_ADDR_WIDTH-1 downto 0);
     end record;
     type test_sdo is record
         data_rd  : std_logic_vector(TEST_DATA_WIDTH-1 downto 0);
     end record;
 
+    -- read mux for modules supporting snapshots, returns the live or latched
+    -- register at sdi.addr (x"fe" for addresses out of range)
+    function test_mux(live, snap : test_array; sdi : test_sdi) return std_logic_vector;
+
+end interface_pkg;
+
+package body interface_pkg is
+    function test_mux(live, snap : test_array; sdi : test_sdi) return std_logic_vector is
+        variable data : std_logic_vector(TEST_DATA_WIDTH-1 downto 0) := (others => '0');
+        variable idx  : natural;
+    begin
+        idx := to_integer(unsigned(sdi.addr));
+        if idx < live'low or idx > live'high then
+            data(7 downto 0) := x"fe";
+        elsif sdi.snap_rd = '1' then
+            data := snap(idx);
+        else
+            data := live(idx);
+        end if;
+        return data;
+    end function;
 end interface_pkg;
\ No newline at end of file
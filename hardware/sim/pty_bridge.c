@@ -0,0 +1,67 @@
+/*------------------------------------------------------------------------------
+ * File: pty_bridge.c
+ * File history:
+ *
+ * Description:
+ *         Pseudo terminal used by tb_cosim.vhd (VHPIDIRECT) to exchange bytes
+ *         with uart2bus.py. The slave path is printed on stdout as
+ *         "PTY: /dev/pts/X" once the simulation starts.
+ *
+ * Author: BV
+ *----------------------------------------------------------------------------*/
+
+#define _DEFAULT_SOURCE
+#define _XOPEN_SOURCE 600
+#include <errno.h>
+#include <fcntl.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <termios.h>
+#include <unistd.h>
+
+static int master_fd = -1;
+static int slave_fd = -1;
+
+static void pty_open(void)
+{
+    struct termios tio;
+    const char *name;
+
+    master_fd = posix_openpt(O_RDWR | O_NOCTTY);
+    if (master_fd < 0 || grantpt(master_fd) != 0 || unlockpt(master_fd) != 0) {
+        perror("pty_bridge");
+        exit(1);
+    }
+    name = ptsname(master_fd);
+    /* Keep the slave open ourselves, otherwise the master reports EIO
+     * whenever uart2bus.py disconnects. */
+    slave_fd = open(name, O_RDWR | O_NOCTTY);
+    if (slave_fd >= 0 && tcgetattr(slave_fd, &tio) == 0) {
+        cfmakeraw(&tio);
+        tcsetattr(slave_fd, TCSANOW, &tio);
+    }
+    fcntl(master_fd, F_SETFL, fcntl(master_fd, F_GETFL) | O_NONBLOCK);
+    printf("PTY: %s\n", name);
+    fflush(stdout);
+}
+
+/* Return the next byte from the host or -1 if none is pending. */
+int pty_read(void)
+{
+    unsigned char c;
+
+    if (master_fd < 0) pty_open();
+    if (read(master_fd, &c, 1) == 1) return c;
+    return -1;
+}
+
+/* Send a byte to the host. */
+void pty_write(int b)
+{
+    unsigned char c = (unsigned char)b;
+
+    if (master_fd < 0) pty_open();
+    while (write(master_fd, &c, 1) != 1 && errno == EAGAIN) {
+        usleep(100);
+    }
+}
@@ -0,0 +1,167 @@
+--------------------------------------------------------------------------------
+-- File: tb_cosim.vhd
+-- File history:
+--
+-- Description:
+--         Co-simulation of top_level (example_top_level.vhd) under GHDL.
+--         Bytes are exchanged with uart2bus.py over a pseudo terminal
+--         (pty_bridge.c). With SIM_BYTE_IF = false the bytes are serialized
+--         on UART_RX/UART_TX with the real bit timing, with SIM_BYTE_IF = true
+--         they are handed to bus2uart_core at the uart_rx/uart_tx boundary.
+--         Use software/cosim.py to build and run.
+--
+-- Author: BV
+--------------------------------------------------------------------------------
+
+package cosim_pkg is
+    -- next byte from the host, -1 if nothing is pending
+    impure function pty_read return integer;
+    attribute foreign of pty_read : function is "VHPIDIRECT pty_read";
+    -- send byte to the host
+    procedure pty_write(b : integer);
+    attribute foreign of pty_write : procedure is "VHPIDIRECT pty_write";
+end cosim_pkg;
+
+package body cosim_pkg is
+    impure function pty_read return integer is
+    begin
+        assert false report "VHPIDIRECT pty_read" severity failure;
+        return -1;
+    end function;
+
+    procedure pty_write(b : integer) is
+    begin
+        assert false report "VHPIDIRECT pty_write" severity failure;
+    end procedure;
+end cosim_pkg;
+
+library IEEE;
+
+use IEEE.std_logic_1164.all;
+use IEEE.numeric_std.all;
+
+library work;
+use work.cosim_pkg.all;
+
+entity tb_cosim is
+    generic (
+        CLK_FREQ    : natural := 50e6;
+        BAUD_RATE   : natural := 115200;
+        SIM_BYTE_IF : boolean := false;
+        -- clock cycles between two polls of the pty
+        POLL_CYCLES : natural := 64
+    );
+end tb_cosim;
+
+architecture behavior of tb_cosim is
+    constant CLK_PERIOD : time := 1 sec / CLK_FREQ;
+    constant BIT_TIME   : time := 1 sec / BAUD_RATE;
+
+    signal clk     : std_logic := '0';
+    signal reset   : std_logic := '1';
+    signal BTNs    : std_logic_vector(7 downto 0) := x"a5";
+    signal LEDs    : std_logic_vector(7 downto 0);
+    signal UART_RX : std_logic := '1';
+    signal UART_TX : std_logic;
+begin
+
+    clk <= not clk after CLK_PERIOD/2;
+    reset <= '0' after 10*CLK_PERIOD;
+
+    dut: entity work.top_level
+        generic map (
+            CLK_FREQ    => CLK_FREQ,
+            SIM_BYTE_IF => SIM_BYTE_IF
+        )
+        port map (
+            clk     => clk,
+            reset   => reset,
+            BTNs    => BTNs,
+            LEDs    => LEDs,
+            UART_RX => UART_RX,
+            UART_TX => UART_TX
+        );
+
+    -- Full UART: serialize host bytes on UART_RX, deserialize UART_TX
+    bit_g : if not SIM_BYTE_IF generate
+        RX_PROC : process
+            variable b : integer;
+            variable byte : std_logic_vector(7 downto 0);
+        begin
+            wait until reset = '0';
+            loop
+                b := pty_read;
+                if b < 0 then
+                    wait for POLL_CYCLES*CLK_PERIOD;
+                else
+                    byte := std_logic_vector(to_unsigned(b, 8));
+                    -- start bit, 8 data bits (LSB first), stop bit
+                    UART_RX <= '0';
+                    wait for BIT_TIME;
+                    for i in 0 to 7 loop
+                        UART_RX <= byte(i);
+                        wait for BIT_TIME;
+                    end loop;
+                    UART_RX <= '1';
+                    wait for BIT_TIME;
+                end if;
+            end loop;
+        end process;
+
+        TX_PROC : process
+            variable byte : std_logic_vector(7 downto 0);
+        begin
+            wait until falling_edge(UART_TX) and reset = '0';
+            -- sample in the middle of each bit
+            wait for BIT_TIME + BIT_TIME/2;
+            for i in 0 to 7 loop
+                byte(i) := UART_TX;
+                wait for BIT_TIME;
+            end loop;
+            pty_write(to_integer(unsigned(byte)));
+        end process;
+    end generate;
+
+    -- Fast mode: drive the byte interface of bus2uart_core directly.
+    -- The external names must follow dut to be elaborated after it.
+    byte_g : if SIM_BYTE_IF generate
+        alias core_rx_data is << signal .tb_cosim.dut.TEST_I.uart_rx_data : std_logic_vector(7 downto 0) >>;
+        alias core_rx_valid is << signal .tb_cosim.dut.TEST_I.uart_rx_valid : std_logic >>;
+        alias core_tx_data is << signal .tb_cosim.dut.TEST_I.uart_tx_data : std_logic_vector(7 downto 0) >>;
+        alias core_tx_valid is << signal .tb_cosim.dut.TEST_I.uart_tx_valid : std_logic >>;
+        alias core_tx_rdy is << signal .tb_cosim.dut.TEST_I.uart_tx_rdy : std_logic >>;
+    begin
+        BYTE_PROC : process(clk)
+            variable b : integer;
+            variable poll_cnt : natural range 0 to POLL_CYCLES := 0;
+        begin
+            if rising_edge(clk) then
+                core_rx_valid <= '0';
+                core_tx_rdy <= '1';
+                if reset = '1' then
+                    core_rx_data <= (others => '0');
+                    poll_cnt := 0;
+                else
+                    -- Byte accepted by the "transmitter", drop ready for one
+                    -- cycle as the real uart_tx does
+                    if core_tx_valid = '1' then
+                        pty_write(to_integer(unsigned(core_tx_data)));
+                        core_tx_rdy <= '0';
+                    end if;
+                    -- One received byte per poll, keeps the core FSM in step
+                    if poll_cnt >= POLL_CYCLES then
+                        poll_cnt := 0;
+                        b := pty_read;
+                        if b >= 0 then
+                            core_rx_data <= std_logic_vector(to_unsigned(b, 8));
+                            core_rx_valid <= '1';
+                        end if;
+                    else
+                        poll_cnt := poll_cnt + 1;
+                    end if;
+                end if;
+            end if;
+        end process;
+    end generate;
+
+end behavior;
@@ -0,0 +1,153 @@
+import sys, os
+import argparse
+import shutil
+import subprocess
+import threading
+
+# Paths relative to this file
+HW_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "hardware")
+SIM_DIR = os.path.join(HW_DIR, "sim")
+
+# Analysis order matters
+LIB_FILES = [
+    "interface.vhd",
+    "arith.vhd",
+    "UART/comp/uart_clk_div.vhd",
+    "UART/comp/uart_debouncer.vhd",
+    "UART/comp/uart_parity.vhd",
+    "UART/comp/uart_rx.vhd",
+    "UART/comp/uart_tx.vhd",
+    "UART/uart.vhd",
+    "bus2uart_core.vhd",
+]
+TOP_FILES = [
+    os.path.join(HW_DIR, "example_top_level.vhd"),
+    os.path.join(SIM_DIR, "tb_cosim.vhd"),
+]
+GHDL_FLAGS = ["--std=08", "-fsynopsys"]
+
+
+def run(cmd, cwd):
+    print(" ".join(cmd))
+    subprocess.run(cmd, cwd=cwd, check=True)
+
+
+def build(workdir, ghdl="ghdl", cc="cc"):
+    """
+    Analyze all sources and elaborate tb_cosim with the pty bridge linked in.
+    Requires a GHDL with gcc or llvm backend (VHPIDIRECT linking).
+    """
+    os.makedirs(workdir, exist_ok=True)
+    flags = GHDL_FLAGS + [f"--workdir={workdir}", f"-P{workdir}"]
+    libDir = os.path.join(HW_DIR, "lib_debug2uart")
+    run([ghdl, "-a"] + flags + ["--work=lib_debug2uart"] + [os.path.join(libDir, f) for f in LIB_FILES], workdir)
+    run([ghdl, "-a"] + flags + TOP_FILES, workdir)
+    run([cc, "-c", os.path.join(SIM_DIR, "pty_bridge.c"), "-o", "pty_bridge.o"], workdir)
+    run([ghdl, "-e"] + flags + ["-Wl,pty_bridge.o", "tb_cosim"], workdir)
+
+
+def simulate(workdir, fast=False, clkFreq=int(50e6), baud=115200, ghdl="ghdl"):
+    """
+    Start the simulation in the background.
+    Returns the process and the pty path uart2bus.py has to connect to.
+    """
+    flags = GHDL_FLAGS + [f"--workdir={workdir}", f"-P{workdir}"]
+    generics = [f"-gSIM_BYTE_IF={str(fast).lower()}", f"-gCLK_FREQ={clkFreq}", f"-gBAUD_RATE={baud}"]
+    cmd = [ghdl, "-r"] + flags + ["tb_cosim"] + generics
+    print(" ".join(cmd))
+    proc = subprocess.Popen(cmd, cwd=workdir, stdout=subprocess.PIPE, text=True, bufsize=1)
+    # pty_bridge.c prints its path as soon as the testbench touches it
+    for line in proc.stdout:
+        if line.startswith("PTY:"):
+            return proc, line.split(":", 1)[1].strip()
+        print(line, end="")
+    raise RuntimeError("simulation ended before the pty was opened")
+
+
+def check(pty, cfg, baud=115200, timeout=60.0):
+    """
+    Smoke test of the simulated design: hello, plain, framed and snapshot
+    reads of BTN (driven to 0xa5 by tb_cosim) and a short block memory read.
+    Returns True if all steps pass.
+    """
+    from uart2bus import UART2Debug
+
+    ok = True
+    def step(name, passed):
+        nonlocal ok
+        print(f"{'PASS' if passed else 'FAIL'} {name}")
+        ok = ok and passed
+
+    try:
+        # Calibration would take minutes of simulated traffic
+        with UART2Debug.open(pty, cfg, baud=baud, timeout=timeout, calibrate=False) as dbg:
+            step("hello", True)
+            step("read", dbg.read("BTN") == 0xa5)
+            dbg.framed = True
+            step("framed read", dbg.read("BTN") == 0xa5)
+            dbg.useSnapshot = True
+            step("snapshot read", dbg.read("BTN") == 0xa5)
+            dbg.useSnapshot = False
+            step("block memory read", dbg.dumpMemory(0x02, 0, 16) is not None)
+    except (IOError, TimeoutError) as e:
+        step(f"connection ({e})", False)
+    return ok
+
+
+def initParser():
+    parser = argparse.ArgumentParser(description="Co-simulation of bus2uart_core and example_top_level.vhd under GHDL.\
+                                                  The simulated UART is exposed as a pseudo terminal that uart2bus.py \
+                                                  (or any UART2Debug script) can open like a real serialport.")
+    parser.add_argument("--fast", action="store_true",
+                        help="Exchange bytes at the uart_rx/uart_tx boundary instead of simulating every bit period")
+    parser.add_argument("--baud", type=int, default=115200,
+                        help="Baudrate of the simulated UART (must match TEST_BAUDRATE of the top level)")
+    parser.add_argument("--clk", type=int, default=int(50e6),
+                        help="Simulated clock frequency in Hz")
+    parser.add_argument("--workdir", type=str, default=os.path.join(SIM_DIR, "build"),
+                        help="GHDL work directory")
+    parser.add_argument("--noBuild", action="store_true",
+                        help="Reuse the previously elaborated testbench")
+    parser.add_argument("--gui", action="store_true",
+                        help="Start uart2bus.py connected to the simulation")
+    parser.add_argument("--check", action="store_true",
+                        help="Run a smoke test against the simulation and exit with its result (for CI)")
+    parser.add_argument("--cfg", type=str, default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "uart2bus.json"),
+                        help="JSON with register configuration passed to uart2bus.py")
+    return parser
+
+
+# _______________Can be called as main__________________
+if __name__ == '__main__':
+    parser = initParser()
+    args = parser.parse_args()
+
+    if shutil.which("ghdl") is None:
+        print("ghdl not found in PATH")
+        sys.exit(1)
+
+    workdir = os.path.abspath(args.workdir)
+    if not args.noBuild:
+        build(workdir)
+
+    proc, pty = simulate(workdir, fast=args.fast, clkFreq=args.clk, baud=args.baud)
+    print(f"Simulation running, connect to {pty}")
+    # Keep forwarding simulator output so the pipe never blocks it
+    forward_thread = threading.Thread(target=lambda: [print(l, end="") for l in proc.stdout])
+    forward_thread.daemon = True
+    forward_thread.start()
+    result = 0
+    try:
+        if args.check:
+            result = 0 if check(pty, args.cfg, baud=args.baud) else 1
+        elif args.gui:
+            gui = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uart2bus.py")
+            subprocess.run([sys.executable, gui, pty, "--baud", str(args.baud), "--cfg", args.cfg])
+        else:
+            proc.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proc.terminate()
+        proc.wait()
+    sys.exit(result)
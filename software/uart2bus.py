@@ -1,12 +1,7 @@
 import sys, os
 
-from PySide6 import QtCore, QtWidgets, QtGui
-from PySide6.QtWidgets import QApplication, QTreeWidget, QTreeWidgetItem, QHeaderView, QCheckBox
-from PySide6.QtCore import Qt, QSize
-from PySide6.QtGui import QColor, QFont
-from functools import partial
-
 import serial
+import serial.tools.list_ports
 import argparse
 import sys
 import time
@@ -88,29 +83,256 @@ testData = {
                 "type": "hex"
             }
         }
+    },
+    "Samples" : {
+        "hex": "0x02",
+        "signals": {
+            "wr_ptr" : {
+                "hex": "0x00",
+                "type": "uint16"
+            },
+            "DEPTH" : {
+                "hex": "0x01",
+                "type": "uint16"
+            }
+        }
     }
 }
 
 
 import threading
 import struct
+import ast
+import json
+import signal
+from collections import deque, OrderedDict
+
+# Per device link parameters found by UART2Debug.calibrateLink()
+CALIBRATION_FILE = os.path.join(os.path.expanduser("~"), ".uart2bus_calibration.json")
+
+
+# Reply fifo of bus2uart_core (generic TX_FIFO_DEPTH)
+TX_FIFO_DEPTH = 64
+# Framed reply: tag, sel, addr, 4 data bytes, status, crc
+FRAME_LEN = 9
+# Status bits of a framed reply
+FRAME_ERROR = 0x01
+PARITY_ERROR = 0x02
+TX_OVERFLOW = 0x04
+# Request tags never collide with opcodes, bus2uart_core drops requests with other tags
+FRAME_TAG_MIN = 0x80
+FRAME_TAG_MAX = 0xfd
+# After a corrupt byte bus2uart_core only executes framed reads and hellos
+# until no byte was received for 100ms
+RESYNC_TIME = 0.12
+# Block memory read: 24 bit start address, 16 bit word count
+MEM_ADDR_LIMIT = 2**24
+
+
+def crc8(data, crc=0):
+    """
+    CRC-8 (polynomial x^8 + x^2 + x + 1) as computed by bus2uart_core
+    """
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xff if crc & 0x80 else (crc << 1) & 0xff
+    return crc
+
+
+class Trigger(object):
+    """
+    Software trigger evaluated on each decoded frame.
+    A frame maps signal keys (and unique signal names) to numeric values.
+    The captured signals are kept in a pre-trigger ring buffer. Once fired,
+    UART2Debug burst polls only these signals for postTrigger seconds and
+    the whole window is saved to captureFile.
+    """
+
+    def __init__(self, condition, signals, preTrigger=100, postTrigger=0.5, captureFile="capture_{n}.csv", rearm=False,
+                 names=None, bitwise=False):
+        # condition(prev, cur) -> bool, prev is None for the first frame
+        self.condition = condition
+        self.signals = list(signals)
+        # Names of the captured signals as given, used as csv header
+        self.labels = list(self.signals)
+        # Signals read by the condition (checked by UART2Debug.setTrigger) and
+        # whether it applies bit operations (integer signals only)
+        self.names = list(self.signals if names is None else names)
+        self.bitwise = bitwise
+        self.warned = set()
+        self.postTrigger = postTrigger
+        self.captureFile = captureFile
+        self.rearm = rearm
+        self.pre = deque(maxlen=preTrigger)
+        self.captures = 0
+        self.arm()
+
+    @classmethod
+    def value(cls, name, value, **kwargs):
+        """Fire if signal equals value."""
+        return cls(lambda prev, cur: cur[name] == value, [name], **kwargs)
+
+    @classmethod
+    def mask(cls, name, mask, match, **kwargs):
+        """Fire if (signal & mask) equals match."""
+        return cls(lambda prev, cur: cur[name] & mask == match, [name], bitwise=True, **kwargs)
+
+    @classmethod
+    def edge(cls, name, edge="rising", mask=None, **kwargs):
+        """
+        Fire if the (masked) signal becomes non-zero (rising),
+        becomes zero (falling) or changes at all (any).
+        """
+        def condition(prev, cur):
+            if prev is None: return False
+            a, b = prev[name], cur[name]
+            if mask is not None: a, b = a & mask, b & mask
+            if edge == "rising": return not a and b
+            elif edge == "falling": return a and not b
+            return a != b
+        return cls(condition, [name], bitwise=mask is not None, **kwargs)
+
+    @classmethod
+    def expression(cls, expr, signals=None, **kwargs):
+        """
+        Fire if the python expression is true. The current frame is
+        available as v, the previous one as p, e.g. 'v["cnt"] > p["cnt"] + 10'.
+        Captures the signals used in the expression if signals is None.
+        """
+        tree = ast.parse(expr, "<trigger>", "eval")
+        names = [node.slice.value for node in ast.walk(tree)
+                 if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id in ("v", "p")
+                 and isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str)]
+        names = list(dict.fromkeys(names))
+        code = compile(tree, "<trigger>", "eval")
+        def condition(prev, cur):
+            return eval(code, {"__builtins__": {}}, {"v": cur, "p": prev if prev is not None else cur})
+        return cls(condition, names if signals is None else signals, names=names, **kwargs)
+
+    def arm(self):
+        """(Re)arm the trigger and clear the captured window."""
+        self.pre.clear()
+        self.post = []
+        self.prev = None
+        self.fired = False
+        self.triggerTime = None
+
+    def process(self, timestamp, frame):
+        """
+        Evaluate the condition on a frame. Returns True if the trigger fired.
+        """
+        fired = False
+        if not self.fired:
+            try:
+                fired = bool(self.condition(self.prev, frame))
+            # Signal not part of this frame (update disabled) or wrong type,
+            # keep polling but tell once why the trigger can not fire
+            except KeyError as e:
+                self.warn(f"Trigger: signal {e} not in frame, enable its update")
+            except TypeError as e:
+                self.warn(f"Trigger: {e}")
+        self.prev = frame
+        self.pre.append((timestamp, [frame.get(k) for k in self.signals]))
+        if fired:
+            self.fired = True
+            self.triggerTime = timestamp
+        return fired
+
+    def warn(self, msg):
+        """Print a message once."""
+        if msg not in self.warned:
+            self.warned.add(msg)
+            print(msg)
+
+    def capture(self, timestamp, frame):
+        """Add a burst polled frame to the post-trigger window."""
+        self.post.append((timestamp, [frame.get(k) for k in self.signals]))
+
+    def save(self):
+        """
+        Save the captured window as csv with the time relative to the trigger.
+        Returns the filename.
+        """
+        fn = self.captureFile.format(n=self.captures)
+        rows = [[t - self.triggerTime] + [np.nan if v is None else v for v in values] for t, values in list(self.pre) + self.post]
+        np.savetxt(fn, np.array(rows, dtype=float), fmt="%.9g", delimiter=",", header=",".join(["time"] + self.labels), comments="")
+        self.captures += 1
+        return fn
 
 
 class UART2Debug(object):
 
-    def __init__(self, signalConfig=None, updateFunc=None, updateTime=1.0) -> None:
+    # numpy types of the signal types
+    NP_TYPES = {"int8": np.int8, "uint8": np.uint8, "int16": np.int16, "uint16": np.uint16,
+                "int32": np.int32, "uint32": np.uint32, "char": np.uint8, "hex": np.uint32, "float": np.float32}
+
+    def __init__(self, signalConfig=None, updateFunc=None, updateTime=1.0, clkFreq=50e6, useSnapshot=False, port=None, baud=115200) -> None:
         
         self.read_thread_running = True
         self.inited = False
+        self.running = False
+        self.port = port
+        self.baud = baud
         self.serialPort = None
         self.serial_thread = None
+        # Serializes transactions of the update thread and scripts
+        self.lock = threading.RLock()
         if signalConfig is not None:
             self.setSignalConfig(signalConfig)
 
         self.updateTime = updateTime
+        # Latch all registers before each block read and use the FPGA cycle
+        # counter (clkFreq) as timestamp instead of host time
+        self.clkFreq = clkFreq
+        self.useSnapshot = useSnapshot
+        # Requests per batch of a block read. A 4 byte reply takes longer than
+        # its (2 or 3 byte) request, the replies of a batch must fit the tx fifo.
+        self.batchSize = TX_FIFO_DEPTH // 2
+        # Link parameters, tuned by calibrateLink() on connect
+        self.calibrate = True
+        self.forceCalibration = False
+        self.readTimeout = 1.0
+        self.requestDelay = 0.6 # ms between two requests
+        # Framed protocol: tagged, checksummed replies with frameWindow requests
+        # in flight (limited by the tx fifo of bus2uart_core: 64 // FRAME_LEN)
+        self.framed = False
+        self.frameWindow = 7
+        self.frameRetries = 3
+        self.frameTag = FRAME_TAG_MIN
+        self.resetLinkStats()
         self.dataCBs = []
+        self.timedDataCBs = []
         self.registerDataUpdateCB(updateFunc)
         self.connectionCBs = []
+        self.trigger = None
+
+    @classmethod
+    def open(cls, port, cfg, baud=115200, timeout=5.0, calibrate=True, **kwargs):
+        """
+        Connect for scripting, without update thread. cfg is a signal config
+        dict or JSON file. calibrate=False skips latency tuning and calibration.
+        Use as context manager:
+            with UART2Debug.open("/dev/ttyUSB0", "uart2bus.json") as dbg:
+                dbg.wait_for("Fire", lambda v: v != 0, timeout=2.0)
+        """
+        dbg = cls(port=port, baud=baud, **kwargs)
+        dbg.calibrate = calibrate
+        if isinstance(cfg, dict):
+            dbg.setSignalConfig(cfg)
+        else:
+            dbg.setSignalConfigFromFile(cfg)
+        if not dbg.connect(poll=False, timeout=timeout):
+            raise IOError(f"cannot connect to debug2uart on {port}")
+        return dbg
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.serialPort is not None:
+            self.disconnect()
+        return False
 
     def setSignalConfig(self, signalConfig):
         # Reorganize this dict to be one dimensional 
@@ -126,6 +348,43 @@ class UART2Debug(object):
                     sigCfg[key]["update"] = True
 
         self.signalConfig = sigCfg
+        # Short names: "entity.signal" and the plain signal name if unique
+        names = [cfg["signal"] for cfg in sigCfg.values()]
+        self.signalAliases = {}
+        for key, cfg in sigCfg.items():
+            self.signalAliases[f"{cfg['entity']}.{cfg['signal']}"] = key
+            if names.count(cfg["signal"]) == 1:
+                self.signalAliases[cfg["signal"]] = key
+
+    def resolveKey(self, name):
+        """
+        Return the signal key of a full key, "entity.signal" or a unique signal name.
+        """
+        if name in self.signalConfig: return name
+        if name in self.signalAliases: return self.signalAliases[name]
+        raise KeyError(f"unknown signal {name}")
+
+    def setTrigger(self, trigger):
+        """
+        Set (or clear with None) the software trigger.
+        Raises KeyError for unknown signals and TypeError for bit operations on floats.
+        """
+        if trigger is not None:
+            keys = [self.resolveKey(k) for k in trigger.names]
+            if trigger.bitwise:
+                for n, k in zip(trigger.names, keys):
+                    if self.signalConfig[k]["type"] == "float":
+                        raise TypeError(f"trigger masks float signal {n}")
+            for n, k in zip(trigger.names, keys):
+                if not self.signalConfig[k]["update"]:
+                    print(f"Trigger: update of {n} is disabled, the trigger can not fire")
+            # Resolved keys (each once) and the name first given for each
+            captured = {}
+            for label in trigger.labels:
+                captured.setdefault(self.resolveKey(label), label)
+            trigger.signals = list(captured)
+            trigger.labels = list(captured.values())
+        self.trigger = trigger
 
     def setSignalConfigFromFile(self, fn):
         with open(fn, "r") as f:
@@ -139,6 +398,14 @@ class UART2Debug(object):
         if updateFunc is not None:
             self.dataCBs.append(updateFunc)
 
+    def registerTimedDataUpdateCB(self, updateFunc):
+        """
+        Register a data update function that also gets the frame timestamp:
+        updateFunc(data, timestamp) with FPGA time (snapshots) or host time in seconds.
+        """
+        if updateFunc is not None:
+            self.timedDataCBs.append(updateFunc)
+
     def registerConnectCB(self, connectionCB):
         """
         Register a function that is called on a connection.
@@ -170,11 +437,16 @@ class UART2Debug(object):
         self.disconnect()
         self.send2connectionCBs(False, e=e)
 
-    def waitForConnection(self):
+    def waitForConnection(self, timeout=None):
         """
         Actively wait for correct response from debug2uart.
+        Returns False on error or timeout.
         """
+        start = time.perf_counter()
         while self.running:
+            if timeout is not None and time.perf_counter() - start > timeout:
+                print("no answer from debug2uart")
+                return False
             # Flush input
             try:
                 ch = self.serialPort.read_all()
@@ -182,7 +454,7 @@ class UART2Debug(object):
                 ch = self.serialPort.read(1)
             except Exception as e:
                 self.connectionError(e)
-                return
+                return False
             if len(ch) != 1:
                 print("try again")
                 time.sleep(0.5)
@@ -192,7 +464,27 @@ class UART2Debug(object):
                 time.sleep(1.0)
                 continue
             print("Connection successful")
-            return
+            return True
+        return False
+
+    def snapshot(self):
+        """
+        Latch all registers and the cycle counter in one clock edge.
+        Returns the latched cycle counter.
+        """
+        try:
+            with self.lock:
+                _ = self.serialPort.read_all()
+                self.serialPort.write(b"\x02")
+                ch = self.serialPort.read(8)
+                # Dropped while bus2uart_core resyncs
+                if len(ch) != 8:
+                    self.waitResync()
+                    return None
+        except Exception as e:
+            self.connectionError(e)
+            return None
+        return struct.unpack('<Q', ch)[0]
 
     def readSignal(self, cfgEntry):
         return self.readAddress(cfgEntry["hex"], sel=cfgEntry["sel"] if "sel" in cfgEntry else None)
@@ -220,9 +512,26 @@ class UART2Debug(object):
         return ch
 
 
-    def blockRead(self, addresses, sels=None):
+    def blockRead(self, addresses, sels=None, snapshot=False):
+        """
+        Block read of bytes from the given addresses in batches of batchSize.
+        If snapshot is set, values are read from the copy latched by snapshot().
+        """
+        if self.framed:
+            return self.framedRead(addresses, sels, snapshot=snapshot)
+        batch = len(addresses) if not self.batchSize else self.batchSize
+        res = []
+        with self.lock:
+            for i in range(0, len(addresses), max(batch, 1)):
+                chunk = self.batchRead(addresses[i:i+batch], None if sels is None else sels[i:i+batch], snapshot=snapshot)
+                if chunk is None:
+                    return None
+                res += chunk
+        return res
+
+    def batchRead(self, addresses, sels=None, snapshot=False):
         """
-        Block read of bytes from the given addresses
+        Send all read requests at once and read all answers
         """
         try:
             # Flush remaining incoming data
@@ -231,7 +540,7 @@ class UART2Debug(object):
             self.connectionError(e)
         # All register read requests at once
         for i,addr in enumerate(addresses):
-            byts = b"\x00"
+            byts = b"\x04" if snapshot else b"\x00"
             if sels is not None and i < len(sels) and sels[i] is not None: 
                 byts += struct.pack('>B', sels[i])
 
@@ -243,7 +552,7 @@ class UART2Debug(object):
                 self.connectionError(e)
                 return None
             # As fast as possible
-            self.accurate_delay(0.6)
+            self.accurate_delay(self.requestDelay)
         try:
             # Read all at once
             ch = self.serialPort.read(len(addresses)*4)
@@ -251,6 +560,7 @@ class UART2Debug(object):
             self.connectionError(e)
             return None
         if len(ch) != len(addresses)*4:
+            self.waitResync()
             return None
         # Split
         res = []
@@ -258,6 +568,194 @@ class UART2Debug(object):
             res.append(ch[i*4:(i+1)*4])
         return res
 
+    def resetLinkStats(self):
+        self.linkStats = {"frames": 0, "corrupt": 0, "retries": 0, "timeouts": 0, "failed": 0,
+                          "frameErrors": 0, "parityErrors": 0, "overflows": 0}
+
+    def linkErrors(self):
+        """
+        Number of link errors that may have put bus2uart_core into resync
+        """
+        return sum(self.linkStats[k] for k in ("frameErrors", "parityErrors", "corrupt", "timeouts", "retries", "failed"))
+
+    def waitResync(self):
+        """
+        Keep the line quiet until bus2uart_core executes all requests again.
+        """
+        time.sleep(RESYNC_TIME)
+        try:
+            _ = self.serialPort.read_all()
+        except Exception as e:
+            self.connectionError(e)
+
+    def errorRates(self):
+        """
+        Link errors of the framed protocol per received frame
+        """
+        frames = max(self.linkStats["frames"], 1)
+        return {k: v/frames for k,v in self.linkStats.items() if k != "frames"}
+
+    def parseFrames(self, buf, inflight, res, retry):
+        """
+        Match framed replies in buf to requests in flight (in send order).
+        Bytes that do not start a valid frame are skipped to resync.
+        Requests sent before a matched one got lost and are added to retry.
+        Returns the unparsed rest of buf.
+        """
+        i = 0
+        skipped = False
+        while len(buf) - i >= FRAME_LEN:
+            frame = buf[i:i+FRAME_LEN]
+            tag = frame[0]
+            if tag in inflight and inflight[tag][1:] == (frame[1], frame[2]) and crc8(frame[:-1]) == frame[-1]:
+                # Replies arrive in request order
+                while True:
+                    t, (idx, _, _) = inflight.popitem(last=False)
+                    if t == tag: break
+                    retry.append(idx)
+                res[idx] = frame[3:7]
+                status = frame[7]
+                self.linkStats["frames"] += 1
+                if status & FRAME_ERROR: self.linkStats["frameErrors"] += 1
+                if status & PARITY_ERROR: self.linkStats["parityErrors"] += 1
+                if status & TX_OVERFLOW: self.linkStats["overflows"] += 1
+                i += FRAME_LEN
+                skipped = False
+            else:
+                if not skipped: self.linkStats["corrupt"] += 1
+                skipped = True
+                i += 1
+        return buf[i:]
+
+    def framedRead(self, addresses, sels=None, snapshot=False):
+        """
+        Pipelined read with the framed protocol. Keeps frameWindow requests
+        in flight and retries only lost or corrupt ones.
+        """
+        cmd = 0x14 if snapshot else 0x10
+        res = [None]*len(addresses)
+        tries = [0]*len(addresses)
+        pending = deque(range(len(addresses)))
+        # tag -> (index, sel, addr) in send order
+        inflight = OrderedDict()
+        buf = b""
+        errors = self.linkErrors()
+        with self.lock:
+            try:
+                _ = self.serialPort.read_all()
+                while len(pending) > 0 or len(inflight) > 0:
+                    out = b""
+                    while len(pending) > 0 and len(inflight) < self.frameWindow:
+                        idx = pending.popleft()
+                        sel = 0 if sels is None or sels[idx] is None else sels[idx]
+                        tag = self.frameTag
+                        self.frameTag = self.frameTag + 1 if self.frameTag < FRAME_TAG_MAX else FRAME_TAG_MIN
+                        out += struct.pack('>BBBB', cmd, tag, sel, addresses[idx])
+                        inflight[tag] = (idx, sel, addresses[idx])
+                    if len(out) > 0:
+                        self.serialPort.write(out)
+                    # Wait for at least one frame (up to the read timeout)
+                    ch = self.serialPort.read(max(FRAME_LEN - len(buf), self.serialPort.in_waiting, 1))
+                    retry = []
+                    if len(ch) == 0:
+                        # Nothing arrives anymore, all requests in flight are lost
+                        self.linkStats["timeouts"] += 1
+                        retry = [idx for idx,_,_ in inflight.values()]
+                        inflight.clear()
+                        buf = b""
+                    else:
+                        buf = self.parseFrames(buf + ch, inflight, res, retry)
+                    for idx in retry:
+                        tries[idx] += 1
+                        if tries[idx] > self.frameRetries:
+                            self.linkStats["failed"] += 1
+                            return None
+                        self.linkStats["retries"] += 1
+                        pending.append(idx)
+            except Exception as e:
+                self.connectionError(e)
+                return None
+            finally:
+                # Corrupt or lost frames, unframed requests (snapshots, block
+                # memory reads) would be dropped while bus2uart_core resyncs
+                if self.serialPort is not None and self.linkErrors() != errors:
+                    self.waitResync()
+        return res
+
+    def memoryChunk(self, sel, start, count, buf):
+        """
+        Block memory read of count (< 2**16) words into buf (writable, count*4 bytes).
+        Returns False if the reply is incomplete or corrupt.
+        Raises ValueError if the range exceeds the 24 bit address.
+        """
+        if start < 0 or start + count > MEM_ADDR_LIMIT:
+            raise ValueError(f"memory range {start:#x}+{count} exceeds the 24 bit address")
+        timeout = self.serialPort.timeout
+        try:
+            _ = self.serialPort.read_all()
+            # Data arrives at line rate (10 bits per byte)
+            self.serialPort.timeout = self.readTimeout + 1.5*(count*4+2)*10/self.serialPort.baudrate
+            self.serialPort.write(struct.pack('<BB', 0x20, sel) + struct.pack('<L', start)[:3] + struct.pack('<H', count))
+            n = self.serialPort.readinto(buf)
+            trailer = self.serialPort.read(2)
+        except Exception as e:
+            self.connectionError(e)
+            return False
+        finally:
+            if self.serialPort is not None: self.serialPort.timeout = timeout
+        if n != len(buf) or len(trailer) != 2:
+            self.linkStats["timeouts"] += 1
+            self.waitResync()
+            return False
+        status, crc = trailer
+        if status & FRAME_ERROR: self.linkStats["frameErrors"] += 1
+        if status & PARITY_ERROR: self.linkStats["parityErrors"] += 1
+        if status & TX_OVERFLOW: self.linkStats["overflows"] += 1
+        ok = crc8(trailer[:1], crc8(buf)) == crc
+        if not ok: self.linkStats["corrupt"] += 1
+        # The next chunk would be dropped while bus2uart_core resyncs
+        if not ok or status & (FRAME_ERROR | PARITY_ERROR):
+            self.waitResync()
+        return ok
+
+    def dumpMemory(self, sel, start, count, out=None, chunk=4096, progress=None):
+        """
+        Read count 32 bit words starting at start from the ram behind sel
+        (block memory read). out is None (new array), a uint32 numpy array or
+        a filename (memory mapped raw little endian file). Corrupt chunks are
+        retried. progress(done, count) is called after each chunk.
+        Returns the array, None on failure. Raises ValueError if the range
+        exceeds the 24 bit address or out can not hold count 32 bit words.
+        """
+        if start < 0 or start + count > MEM_ADDR_LIMIT:
+            raise ValueError(f"memory range {start:#x}+{count} exceeds the 24 bit address")
+        if out is None:
+            out = np.empty(count, dtype='<u4')
+        elif isinstance(out, str):
+            out = np.memmap(out, dtype='<u4', mode='w+', shape=(count,))
+        # The words are read into the bytes of out in place
+        elif (out.ndim != 1 or out.itemsize != 4 or len(out) < count
+              or not out.flags.c_contiguous or not out.flags.writeable):
+            raise ValueError(f"out must be a writable, contiguous 1d array of at least {count} 32 bit words")
+        # Bytes of the words, filled in place
+        view = memoryview(out[:count].view(np.uint8))
+        chunk = min(chunk, 2**16-1)
+        done = 0
+        with self.lock:
+            while done < count:
+                n = min(chunk, count - done)
+                tries = 0
+                while not self.memoryChunk(sel, start + done, n, view[done*4:(done+n)*4]):
+                    tries += 1
+                    if self.serialPort is None or tries > self.frameRetries:
+                        self.linkStats["failed"] += 1
+                        return None
+                    self.linkStats["retries"] += 1
+                done += n
+                if progress is not None: progress(done, count)
+        if isinstance(out, np.memmap): out.flush()
+        return out
+
     def readValue(self, addr):
         """
         Read hex values from register address
@@ -280,17 +778,272 @@ class UART2Debug(object):
         elif typ == "hex": return hex(struct.unpack('<L', btes)[0])
         elif typ == "float": return struct.unpack('<f', btes)[0]
 
-    def send2dataUpdateCBs(self, data):
+    def convBytes2Number(self, btes, typ):
+        """
+        Convert the given bytes to a number (hex and char as unsigned integers)
+        """
+        if typ == "hex": return struct.unpack('<L', btes)[0]
+        elif typ == "char": return struct.unpack('<B', btes[:1])[0]
+        return self.convBytes2Type(btes, typ)
+
+    def numericFrame(self, keys, res):
+        """
+        Frame of numeric values addressable by key and short names, as used by triggers
+        """
+        frame = {k: self.convBytes2Number(r, self.signalConfig[k]["type"]) for r,k in zip(res, keys)}
+        for alias, key in self.signalAliases.items():
+            if key in frame: frame[alias] = frame[key]
+        return frame
+
+    def frameTimestamp(self):
+        """
+        Timestamp of the next frame. With snapshots, this latches all registers
+        and returns the FPGA time in seconds, otherwise the host time.
+        """
+        if self.useSnapshot:
+            cycles = self.snapshot()
+            return None if cycles is None else cycles/self.clkFreq
+        return time.time()
+
+    def timedBlockRead(self, addresses, sels):
+        """
+        Timestamp (latching with snapshots) and block read as one transaction,
+        so that no other thread can latch in between. (None, None) on failure.
+        """
+        with self.lock:
+            timestamp = self.frameTimestamp()
+            if timestamp is None: return None, None
+            res = self.blockRead(addresses, sels, snapshot=self.useSnapshot)
+        if res is None: return None, None
+        return timestamp, res
+
+    def burstCapture(self):
+        """
+        Poll only the signals of the fired trigger as fast as possible
+        for the post-trigger window and save the captured window.
+        """
+        trigger = self.trigger
+        keys = trigger.signals
+        addresses = [int(self.signalConfig[k]["hex"], 16) for k in keys]
+        sels = [None if "sel" not in self.signalConfig[k] else int(self.signalConfig[k]["sel"], 16) for k in keys]
+        start = time.perf_counter()
+        while self.running and time.perf_counter() - start < trigger.postTrigger:
+            timestamp, res = self.timedBlockRead(addresses, sels)
+            if res is None: continue
+            trigger.capture(timestamp, self.numericFrame(keys, res))
+        fn = trigger.save()
+        print(f"Trigger fired, saved {len(trigger.pre) + len(trigger.post)} frames to {fn}")
+        if trigger.rearm:
+            trigger.arm()
+        else:
+            self.trigger = None
+
+    def send2dataUpdateCBs(self, data, timestamp=None):
         """
         Send data to all cbs
         """
         for cb in self.dataCBs:
             cb(data)
+        for cb in self.timedDataCBs:
+            cb(data, timestamp)
 
     def entityAddress(self, entityKey):
         """Return the sel address of an entity from cfg"""
         return self.signalConfig[entityKey]["hex"]
 
+    def deviceSerial(self):
+        """
+        Serial number of the USB serial adapter, the port path if unknown.
+        """
+        path = os.path.realpath(self.serialPort.port)
+        for port in serial.tools.list_ports.comports():
+            if os.path.realpath(port.device) == path and port.serial_number:
+                return port.serial_number
+        return self.serialPort.port
+
+    def tuneLatency(self):
+        """
+        Reduce USB serial latency on Linux: set ASYNC_LOW_LATENCY and
+        the FTDI latency timer (default 16ms) to 1ms where possible.
+        """
+        if not sys.platform.startswith("linux"):
+            return
+        try:
+            self.serialPort.set_low_latency_mode(True)
+        except (AttributeError, ValueError, OSError) as e:
+            print(f"cannot set low latency mode: {e}")
+        timerFile = f"/sys/bus/usb-serial/devices/{os.path.basename(os.path.realpath(self.serialPort.port))}/latency_timer"
+        if os.path.exists(timerFile):
+            try:
+                with open(timerFile, "w") as f:
+                    f.write("1")
+            except OSError:
+                print(f"cannot set latency timer, try: echo 1 | sudo tee {timerFile}")
+
+    def loadCalibration(self, device):
+        """
+        Cached link parameters of a device, None if not calibrated yet
+        """
+        try:
+            with open(CALIBRATION_FILE, "r") as f:
+                return json.load(f).get(device)
+        except (OSError, ValueError):
+            return None
+
+    def storeCalibration(self, device, params):
+        try:
+            with open(CALIBRATION_FILE, "r") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        cache[device] = params
+        try:
+            with open(CALIBRATION_FILE, "w") as f:
+                json.dump(cache, f, indent=4)
+        except OSError as e:
+            print(f"cannot store calibration: {e}")
+
+    def measureRequestDelay(self, delays=(0.6, 0.4, 0.3, 0.2, 0.1, 0.05, 0.0), repeats=10):
+        """
+        Read full batches (batchSize requests, cycling through the configured
+        signals) with decreasing requestDelay (ms) until a batch comes back incomplete.
+        Returns {delay: (mean, max)} round-trip time in seconds of the complete delays.
+        """
+        keys = list(self.signalConfig)
+        if len(keys) == 0: return {}
+        addresses, sels = self.signalRequests([keys[i % len(keys)] for i in range(self.batchSize)])
+        requestDelay = self.requestDelay
+        rtt = {}
+        with self.lock:
+            try:
+                for delay in delays:
+                    self.requestDelay = delay
+                    times = []
+                    for _ in range(repeats):
+                        start = time.perf_counter()
+                        if self.batchRead(addresses, sels) is None:
+                            break
+                        times.append(time.perf_counter() - start)
+                    if len(times) < repeats:
+                        break
+                    rtt[delay] = (sum(times)/len(times), max(times))
+            finally:
+                self.requestDelay = requestDelay
+        return rtt
+
+    def calibrateLink(self):
+        """
+        Tune latency, then load the link parameters of this device from cache
+        or find the smallest delay between requests at which full batches are
+        still complete and a read timeout with enough margin.
+        """
+        self.tuneLatency()
+        device = f"{self.deviceSerial()}@{self.serialPort.baudrate}"
+        params = None if self.forceCalibration else self.loadCalibration(device)
+        # Recalibrate caches measured with another batch size
+        if params is None or params.get("batchSize") != self.batchSize:
+            print("calibrating link")
+            self.serialPort.timeout = 1.0
+            rtt = self.measureRequestDelay()
+            if len(rtt) == 0:
+                print("calibration failed")
+                return
+            requestDelay = min(rtt)
+            params = {
+                "batchSize": self.batchSize,
+                "requestDelay": requestDelay,
+                "readTimeout": max(0.05, 4*rtt[requestDelay][1]),
+                "rtt": {str(k): v[0] for k,v in rtt.items()},
+            }
+            self.storeCalibration(device, params)
+        self.requestDelay = params["requestDelay"]
+        self.readTimeout = params["readTimeout"]
+        self.serialPort.timeout = self.readTimeout
+        print(f"link: request delay {self.requestDelay}ms, read timeout {self.readTimeout*1000:.1f}ms")
+
+    def signalRequests(self, keys):
+        """
+        Addresses and sels of the given signal keys
+        """
+        addresses = [int(self.signalConfig[k]["hex"], 16) for k in keys]
+        sels = [None if "sel" not in self.signalConfig[k] else int(self.signalConfig[k]["sel"], 16) for k in keys]
+        return addresses, sels
+
+    def readFrame(self, keys, addresses, sels):
+        """
+        Timestamp and numeric values of one block read, (None, None) on failure
+        """
+        if self.serialPort is None:
+            raise IOError("not connected")
+        timestamp, res = self.timedBlockRead(addresses, sels)
+        if res is None: return None, None
+        return timestamp, [self.convBytes2Number(r, self.signalConfig[k]["type"]) for r,k in zip(res, keys)]
+
+    def read(self, names):
+        """
+        Read a signal or a list of signals (names as in resolveKey).
+        Returns the numeric value or a dict {name: value}, None on failure.
+        """
+        single = isinstance(names, str)
+        if single: names = [names]
+        keys = [self.resolveKey(n) for n in names]
+        _, values = self.readFrame(keys, *self.signalRequests(keys))
+        if values is None: return None
+        if single: return values[0]
+        return dict(zip(names, values))
+
+    def sample(self, names, n, rate=None):
+        """
+        Read only the given signals n times at rate Hz (as fast as possible if None).
+        Returns the timestamps and a dict {name: numpy array}. Raises TimeoutError
+        if a sample still fails after frameRetries retries.
+        """
+        if isinstance(names, str): names = [names]
+        keys = [self.resolveKey(name) for name in names]
+        addresses, sels = self.signalRequests(keys)
+        t = np.empty(n)
+        data = {name: np.empty(n, dtype=self.NP_TYPES.get(self.signalConfig[k]["type"], np.uint32)) for name,k in zip(names, keys)}
+        start = time.perf_counter()
+        i = 0
+        retries = 0
+        while i < n:
+            if rate is not None:
+                wait = start + i/rate - time.perf_counter()
+                if wait > 0.002: time.sleep(wait)
+                elif wait > 0: self.accurate_delay(wait*1000)
+            timestamp, values = self.readFrame(keys, addresses, sels)
+            # Retry failed reads
+            if values is None:
+                retries += 1
+                if retries > self.frameRetries:
+                    raise TimeoutError(f"no reply for sample {i} of {names}")
+                continue
+            retries = 0
+            t[i] = timestamp
+            for name, v in zip(names, values):
+                data[name][i] = v
+            i += 1
+        return t, data
+
+    def wait_for(self, name, predicate, timeout=None):
+        """
+        Poll only the watched signal(s) back to back until predicate(value) is true.
+        For a list of names, predicate gets a dict {name: value}. A non callable
+        predicate is compared for equality. Returns the value, raises TimeoutError.
+        """
+        single = isinstance(name, str)
+        names = [name] if single else list(name)
+        keys = [self.resolveKey(n) for n in names]
+        addresses, sels = self.signalRequests(keys)
+        check = predicate if callable(predicate) else (lambda v: v == predicate)
+        start = time.perf_counter()
+        while timeout is None or time.perf_counter() - start < timeout:
+            _, values = self.readFrame(keys, addresses, sels)
+            if values is None: continue
+            value = values[0] if single else dict(zip(names, values))
+            if check(value): return value
+        raise TimeoutError(f"{name} did not match within {timeout}s")
+
     def update_uart(self):
         """
         Thread to update uart
@@ -300,7 +1053,9 @@ class UART2Debug(object):
             if self.serialPort is not None and self.serialPort.is_open:
                 if not self.inited: 
                     print("try init")
-                    self.waitForConnection()
+                    if not self.waitForConnection(): continue
+                    if self.calibrate and self.running:
+                        self.calibrateLink()
                     self.send2connectionCBs(True)
                     self.inited = True
                 else:
@@ -308,11 +1063,13 @@ class UART2Debug(object):
                     # All registers in one chunk
                     addresses = {k: int(self.signalConfig[k]["hex"], 16) for k in self.signalConfig if self.signalConfig[k]["update"]}
                     sels = [None if "sel" not in self.signalConfig[k] else int(self.signalConfig[k]["sel"], 16) for k in self.signalConfig if self.signalConfig[k]["update"]]
-                    res = self.blockRead([addresses[k] for k in addresses], sels)
+                    timestamp, res = self.timedBlockRead([addresses[k] for k in addresses], sels)
                     if res != None:
                         for r,k in zip(res, addresses):
                             data[k] = self.convBytes2Type(r, self.signalConfig[k]["type"])
-                        self.send2dataUpdateCBs(data)
+                        self.send2dataUpdateCBs(data, timestamp=timestamp)
+                        if self.trigger is not None and self.trigger.process(timestamp, self.numericFrame(addresses, res)):
+                            self.burstCapture()
 
                     # Register by register (slow and on windows at least 15ms wait)
                     # Flush remaining
@@ -329,24 +1086,45 @@ class UART2Debug(object):
                     # updateFunc(data)
             time.sleep(self.updateTime)
 
-    def connect(self):
+    def connect(self, port=None, baud=None, poll=True, timeout=None):
         """
-        Connect to the serialport
+        Connect to the serialport.
+        With poll, all signals are updated by a thread every updateTime.
+        Otherwise wait (at most timeout seconds) for debug2uart to answer
+        and leave reading to the caller (see read, sample, wait_for).
         """
+        if port is not None: self.port = port
+        if baud is not None: self.baud = baud
         if self.serialPort is not None:
             print("port already open")
             return False
 
         self.inited = False
-        self.serialPort = serial.Serial(args.port, baudrate=args.baud, timeout=1.0)
+        try:
+            self.serialPort = serial.Serial(self.port, baudrate=self.baud, timeout=1.0)
+        except serial.SerialException as e:
+            print(f"cannot open serialport {self.port}: {e}")
+            return False
         try:
             self.serialPort.open()
         except:
             pass
         if not self.serialPort.is_open:
-            print("cannot open serialport" + str(args.port))
+            print("cannot open serialport" + str(self.port))
+            self.serialPort = None
             return False
         print("serialport connection successfull")
+
+        if not poll:
+            self.running = True
+            if not self.waitForConnection(timeout=timeout):
+                if self.serialPort is not None: self.disconnect()
+                return False
+            if self.calibrate:
+                self.calibrateLink()
+            self.inited = True
+            self.send2connectionCBs(True)
+            return True
         
         self.serial_thread = threading.Thread(target=self.update_uart)
         self.serial_thread.daemon = True
@@ -364,411 +1142,20 @@ class UART2Debug(object):
             print("already closed")
         self.serialPort = None
         self.running = False
-        self.serial_thread.join()
+        # Not from within the update thread itself (connection error)
+        if self.serial_thread is not None and self.serial_thread is not threading.current_thread():
+            self.serial_thread.join()
         self.serial_thread = None
         self.inited = False
+        if self.framed and self.linkStats["frames"] > 0:
+            print(f"link: {self.linkStats}")
         self.send2connectionCBs(False)
 
 
-class LabelledIntField(QtWidgets.QWidget):
-    def __init__(self, title, initial_value=None, unit="", endEditCB=None):
-        QtWidgets.QWidget.__init__(self)
-        layout = QtWidgets.QHBoxLayout()
-        self.setLayout(layout)
-        
-        self.label = QtWidgets.QLabel(alignment=QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
-        self.label.setText(title)
-        self.label.setFont(QFont("Arial",weight=QFont.Bold))
-        layout.addWidget(self.label)
-
-        innerLayout = QtWidgets.QHBoxLayout()
-        self.lineEdit = QtWidgets.QLineEdit(self,  alignment=QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
-        self.lineEdit.setFixedWidth(60)
-        self.lineEdit.setValidator(QtGui.QIntValidator())
-        if initial_value != None:
-            self.lineEdit.setText(str(int(initial_value)))
-        innerLayout.addWidget(self.lineEdit)
-
-        label = QtWidgets.QLabel(alignment=QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter)
-        label.setText(unit)
-        innerLayout.setSpacing(0)
-        innerLayout.addWidget(label)
-
-        layout.addLayout(innerLayout)
-
-        layout.addStretch()
-        if endEditCB != None:
-            self.lineEdit.editingFinished.connect(endEditCB)
-        
-    def setLabelWidth(self, width):
-        self.label.setFixedWidth(width)
-        
-    def setInputWidth(self, width):
-        self.lineEdit.setFixedWidth(width)
-        
-    def getValue(self):
-        return int(self.lineEdit.text())
-
-    def setValue(self, val):
-        return self.lineEdit.setText(str(val))
-
-# Helper alignment delegates
-class AlignRightDelegate(QtWidgets.QStyledItemDelegate):
-    def initStyleOption(self, option, index):
-        super(AlignRightDelegate, self).initStyleOption(option, index)
-        option.displayAlignment = QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter
-class AlignCenterDelegate(QtWidgets.QStyledItemDelegate):
-    def initStyleOption(self, option, index):
-        super(AlignCenterDelegate, self).initStyleOption(option, index)
-        option.displayAlignment = QtCore.Qt.AlignCenter | QtCore.Qt.AlignVCenter
-class AlignLeftDelegate(QtWidgets.QStyledItemDelegate):
-    def initStyleOption(self, option, index):
-        super(AlignLeftDelegate, self).initStyleOption(option, index)
-        option.displayAlignment = QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter
-class BoldNoParentsDelegate(QtWidgets.QStyledItemDelegate):
-    def paint(self, painter, option, index):
-        if index.parent().row() == -1:
-            option.font.setWeight(QFont.Bold)
-        QtWidgets.QStyledItemDelegate.paint(self, painter, option, index)
-class BoldDelegate(QtWidgets.QStyledItemDelegate):
-    def paint(self, painter, option, index):
-        option.font.setWeight(QFont.Bold)
-        QtWidgets.QStyledItemDelegate.paint(self, painter, option, index)
-
-styleSheet = """
-    QTreeView::item:open {
-        background-color: #c5ebfb;
-    }  
-"""
-class UART2DebugWidget(QtWidgets.QWidget):
-    def __init__(self, uart2debug, updateFreq=0.1):
-        super().__init__()
-
-        self.uart2debug = uart2debug
-        self.uart2debug.registerConnectCB(self.connectionStatusChanged)
-        self.uart2debug.registerDataUpdateCB(self.updateData)
-        self.updateFreq = updateFreq
-
-        self.setStyleSheet(styleSheet)
-        self.tree = QTreeWidget()
-        self.headerTitles = ["Name", "Address", "Type", "Value", "Upd"]
-        self.tree.setHeaderLabels(self.headerTitles)
-
-        # Standard for all
-        delegate = AlignCenterDelegate(self.tree)
-        for i in range(len(self.headerTitles)):
-            self.tree.setColumnWidth(i, 60)
-            self.tree.header().setSectionResizeMode(i, QHeaderView.Fixed)
-            self.tree.headerItem().setTextAlignment(i, QtCore.Qt.AlignCenter)
-            self.tree.setItemDelegateForColumn(i, delegate)
-
-        # Specifics
-        self.tree.header().setSectionResizeMode(0, QHeaderView.Stretch)
-        self.tree.setColumnWidth(len(self.headerTitles)-2, 80)
-        self.tree.setColumnWidth(len(self.headerTitles)-1, 30)
-        self.tree.header().setStretchLastSection(False)
-
-        delegate = AlignLeftDelegate(self.tree)
-        self.tree.setItemDelegateForColumn(0, delegate)
-        delegate = AlignRightDelegate(self.tree)
-        self.tree.setItemDelegateForColumn(3, delegate)
-        self.tree.setItemDelegateForColumn(4, delegate)
-
-        self.initTreeView()
-
-        self.is_connected = False
-
-        # Main window layout
-        self.layout = QtWidgets.QVBoxLayout(self)
-        self.button_layout = QtWidgets.QHBoxLayout(self)
-        self.layout.addWidget(self.tree)
-        self.layout.addLayout(self.button_layout)
-        self.layout.setSpacing(0)
-        self.layout.setContentsMargins(0,0,0,0)
-        self.button_layout.setContentsMargins(20,0,20,0)
-
-        # Bottom widgets
-        self.connectButton = QtWidgets.QPushButton("Connect")
-        self.connectButton.clicked.connect(self.connectClicked)
-
-        self.loadButton = QtWidgets.QPushButton("Load Config")
-        self.loadButton.clicked.connect(self.getConfigfile)
-
-        self.updateTime = LabelledIntField('Update time:', unit="ms", initial_value=self.updateFreq*1000, endEditCB=self.updateFreqChanged)
-        
-        self.updateAllCheckBox = QtWidgets.QCheckBox("Update all")
-
-        # Add to layout
-        self.button_layout.addWidget(self.connectButton, alignment=QtCore.Qt.AlignLeft)
-        self.button_layout.addWidget(self.loadButton, alignment=QtCore.Qt.AlignLeft)
-        self.button_layout.addWidget(self.updateTime, alignment=QtCore.Qt.AlignCenter)
-        self.button_layout.addWidget(self.updateAllCheckBox, alignment=QtCore.Qt.AlignRight)
-
-        # Own data
-        self.data = {k:"unknown" for k in self.uart2debug.signalConfig}
-
-        self.updateAllCheckBox.stateChanged.connect(self.updateAllToggle)
-        self.checkSetGroupCheckboxes()
-
-        self.running = True
-        
-        self.dirty = False
-        self.updateTimer = QtCore.QTimer()
-        self.updateTimer.setInterval(int(self.updateFreq*1000))
-        self.updateTimer.timeout.connect(self.updateContent)
-        self.updateTimer.start()
-        self.checkAllTimer = None
-
-    def loadConfigFile(self, fn):
-        uart2debug.setSignalConfigFromFile(fn)
-        self.initTreeView()
-        self.checkSetGroupCheckboxes()
-
-    def getConfigfile(self):
-        fname = QtWidgets.QFileDialog.getOpenFileName(self, 'Open file', 
-            '~',"JSON files (*.json)")
-        self.loadConfigFile(fname[0])
-
-    def initTreeView(self):
-        self.tree.clear()
-        self.treeItems = {}
-        self.checkboxes = []
-        self.entityCheckboxes = {}
-        self.tree.setColumnCount(len(self.headerTitles))
-
-        self.groupedSignals = {}
-        for key, entry in self.uart2debug.signalConfig.items():
-            if entry["entity"] in self.groupedSignals:
-                self.groupedSignals[entry["entity"]].append(entry["signal"])
-            else:
-                self.groupedSignals[entry["entity"]] = [entry["signal"]]
-
-        for entityName, items in self.groupedSignals.items():
-            # Get address of entity by getting dict 
-            # entry of first signal in group 
-            firstSignal = next(i for i in items)
-            key = f"{entityName}_*_{firstSignal}"
-            entitySelAddress = self.uart2debug.signalConfig[key]["sel"]
-            entityItem = QTreeWidgetItem([entityName, entitySelAddress])
-            for signalName in items:
-                key = f"{entityName}_*_{signalName}"
-                entry = self.uart2debug.signalConfig[key]
-                signalItem = QTreeWidgetItem([signalName, entry["hex"], entry["type"], "unknown", ""])
-                entityItem.addChild(signalItem)
-            self.treeItems[entityName] = entityItem
-
-
-        self.tree.insertTopLevelItems(0, [i for _,i in self.treeItems.items()])
-        self.tree.setAnimated(True)
-
-        # Expand only parents
-        proxy = self.tree.model()
-        for row in range(proxy.rowCount()):
-            index = proxy.index(row, 0)
-            self.tree.expand(index)
-
-        # Add update checkbox to each entry
-        j = 0
-        # Loop over entities
-        for entityName,treeItem in self.treeItems.items():
-            checkBox = QCheckBox("")
-            checkBox.setStyleSheet("padding-left:10px; margin-right:50%;")
-            checkBox.stateChanged.connect(partial(self.entityUpdateCheckBox,entityName))
-            self.entityCheckboxes[entityName] = checkBox
-            self.tree.setItemWidget(treeItem, len(self.headerTitles)-1, checkBox)
-
-            # Loop over signals
-            for i in range(treeItem.childCount()):
-                checkBox = QCheckBox("")
-                checkBox.setChecked(self.signalCfgFromIdx(j)["update"])
-                checkBox.setStyleSheet("padding-left:10px; margin-right:50%;")
-                self.tree.setItemWidget(treeItem.child(i), len(self.headerTitles)-1, checkBox)
-                checkBox.toggled.connect(partial(self.checkBoxToggle,j))
-                self.checkboxes.append(checkBox)
-                j += 1
-                
-        self.tree.setItemDelegateForColumn(1, BoldNoParentsDelegate(self))
-        self.tree.setItemDelegateForColumn(0, BoldDelegate(self))
-
-
-    def updateFreqChanged(self):
-        val = self.updateTime.getValue()
-        if val is None or val < 20:
-            self.updateTime.setValue(20)
-            val = 20
-        self.updateTimer.stop()
-        self.uart2debug.updateTime = val/1000.0
-        self.updateTimer = QtCore.QTimer()
-        self.updateTimer.setInterval(val)
-        self.updateTimer.timeout.connect(self.updateContent)
-        self.updateTimer.start()
-
-    def keyFromIdx(self, i):
-        keys = list(self.uart2debug.signalConfig.keys())
-        if i >= 0 and i < len(keys): return keys[i]
-        return None
-
-    def signalCfgFromIdx(self, i):
-        k = self.keyFromIdx(i)
-        if k is None: return None
-        return self.uart2debug.signalConfig[k]
-        return None
-        
-    def connectionStatusChanged(self, connected, error=""):
-        if connected:
-            print("Connected")
-            self.is_connected = True
-            self.connectButton.setText("Disconnect")
-        else:
-            print("Disconnected")
-            self.is_connected = False
-            self.connectButton.setText("Connect")
-        if error != "":
-            print(f"Error: {error}")
-
-    def connect(self):
-        print("trying to connect")
-        con = self.uart2debug.connect()
-        if con: self.connectButton.setText("Waiting")
-        else: self.connectButton.setText("Connect")
-
-    def disconnect(self):
-        print("trying to disconnect")
-        self.connectButton.setText("Connect")
-        self.uart2debug.disconnect()
-        self.is_connected = False
-    
-    @QtCore.Slot()
-    def connectClicked(self):
-        if self.is_connected: 
-            self.disconnect()
-        else: 
-            self.connect()
-    
-    def checkGroup(self, g=None):
-        if g is None:
-            states = [i["update"] for _,i in self.uart2debug.signalConfig.items()]
-        else:
-            states = [i["update"] for _,i in self.uart2debug.signalConfig.items() if i["entity"] == g]
-        allChecked = all(states)
-        allUnchecked = all([not s for s in states])
-        if allChecked: return Qt.Checked
-        elif allUnchecked: return Qt.Unchecked
-        else: return Qt.PartiallyChecked
-
-    def checkSetGroupCheckboxes(self):
-        self.updateAllCheckBox.stateChanged.disconnect()
-        state = self.checkGroup()
-        self.updateAllCheckBox.setCheckState(state)
-        self.updateAllCheckBox.stateChanged.connect(self.updateAllToggle)
-
-        for entityName, checkBox in self.entityCheckboxes.items():
-            checkBox.stateChanged.disconnect()
-            state = self.checkGroup(g=entityName)
-            checkBox.setCheckState(state)
-            checkBox.stateChanged.connect(partial(self.entityUpdateCheckBox,entityName))
-
-        self.checkAllTimer = None
-
-    def checkBoxToggle(self, row, state):
-        k = self.keyFromIdx(row)
-        if k is not None:
-            self.uart2debug.signalConfig[k]["update"] = state
-        if self.checkAllTimer is None:
-            self.checkAllTimer = QtCore.QTimer(self)
-            self.checkAllTimer.singleShot(100, self.checkSetGroupCheckboxes)
-
-    def updateAllToggle(self, state):
-        if state != Qt.PartiallyChecked:
-            for checkBox in self.checkboxes:
-                checkBox.setChecked(state)
-        # Otherwise click cycles through all states rather than
-        # alternating between checked and not checked
-        else:
-            self.updateAllCheckBox.setCheckState(Qt.Checked)
-
-    def entityUpdateCheckBox(self, entityName, state):
-        # TODO: 
-        if state != Qt.PartiallyChecked:
-            print(f"Update: {entityName}: {state}")
-
-            for i,checkBox in enumerate(self.checkboxes):
-                k = self.keyFromIdx(i)
-                if self.uart2debug.signalConfig[k]["entity"] == entityName:
-                    checkBox.setChecked(state)
-        # Otherwise click cycles through all states rather than
-        # alternating between checked and not checked
-        else:
-            try:
-                checkBox = next(c for name,c in self.entityCheckboxes.items() if name == entityName)
-                checkBox.setCheckState(Qt.Checked)
-            except:
-                pass
-
-    def handleItemClicked(self, item):
-        print(item.checkState())
-        if item.column() == 3:
-            print('"%s" Checked' % item.text())
-        else:
-            print('"%s" Clicked' % item.text())
-
-    # def addEntry(self, i, j, text, editable=False, bold=False):
-    #     entry = QTreeWidgetItem(text)
-    #     if bold:
-    #         f = QFont()
-    #         f.setBold(True)
-    #         entry.setFont(f)
-    #     if not editable:
-    #         entry.setFlags(Qt.ItemIsEnabled)
-    #     self.tree.setItem(i, j, entry)
-
-    def updateData(self, dic):
-        for k in dic:
-            self.data[k] = dic[k]
-        self.dirty = True
-
-    def updateContent(self):
-        if self.dirty:
-            for i,k in enumerate(self.data):
-                if self.uart2debug.signalConfig[k]["update"]:
-                    entity, signal = k.split("_*_")
-                    treeItem = self.treeItems[entity]
-                    index = self.groupedSignals[entity].index(signal)
-                    self.tree.topLevelItem(0).child(1).setText(1, f"Test:")
-                    treeItem.child(index).setText(3, f"{self.data[k]}")
-
-        self.dirty = False
-    
-    def stop(self):
-        self.updateTimer.stop()
-
-class MainWindow(QtWidgets.QMainWindow):
-
-    def __init__(self, uart2debug, updateFreq=0.1):
-        # You must call the super class method
-        QtWidgets.QMainWindow.__init__(self)
-        self.setWindowTitle("FPGA data")             # Set the window title
-        self.central_widget = UART2DebugWidget(uart2debug, updateFreq=updateFreq)
-        self.setCentralWidget(self.central_widget)       # Install the central widget
-        self.setMinimumSize(QSize(800, 600))         # Set sizes 
-
-import signal 
-
-def sigint_handler(*args):
-    """Handler for the SIGINT signal."""
-    # sys.stderr.write('\r')
-    # if QtWidgets.QMessageBox.question(None, '', "Are you sure you want to quit?",
-    #                         QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
-    #                         QtWidgets.QMessageBox.No) == QtWidgets.QMessageBox.Yes:
-    QApplication.quit()
-
-
-
-
 def initParser():
     import argparse
     parser = argparse.ArgumentParser(description="Signal tap interface to readout signals on an FPGA over a uart connection.\
-                                                  Use in conjunction with the debug2uart_register or debug2_uart_ram VHDL module.\
+                                                  Use in conjunction with the bus2uart_core VHDL module (registers and block memories).\
                                                   Based on your design, provide a corresponding JSON file with signal names, addresses and \
                                                   data types.")
     parser.add_argument("port", type=str,
@@ -779,11 +1166,32 @@ def initParser():
                         help="Time in seconds to update all values")
     parser.add_argument("--cfg", type=str, default="uart2bus.json",
                         help="JSON with register configuration")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="Latch all registers before each update and timestamp them with the FPGA cycle counter")
+    parser.add_argument("--clk", type=float, default=50e6,
+                        help="Clock frequency of bus2uart_core in Hz (converts cycle counter to seconds)")
+    parser.add_argument("--framed", action="store_true",
+                        help="Use the framed protocol (tagged, checksummed and pipelined requests)")
+    parser.add_argument("--dump", type=str, nargs=4, default=None, metavar=("SEL", "START", "COUNT", "FILE"),
+                        help="Dump COUNT 32 bit words of the ram behind SEL starting at START to FILE (raw little endian) and exit")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="Measure link latency again instead of using the cached parameters of the adapter")
+    parser.add_argument("--noCalibration", action="store_true",
+                        help="Skip latency tuning and calibration on connect")
+    parser.add_argument("--trigger", type=str, default=None,
+                        help="Python expression to trigger a capture, the frame is v, the previous one p, e.g. 'v[\"cnt\"] > 100'")
+    parser.add_argument("--triggerSignals", type=str, nargs="+", default=None,
+                        help="Signals to capture (default: signals used in the trigger expression)")
+    parser.add_argument("--preTrigger", type=int, default=100,
+                        help="Number of frames kept before the trigger")
+    parser.add_argument("--postTrigger", type=float, default=0.5,
+                        help="Time in seconds to burst poll the captured signals after the trigger")
+    parser.add_argument("--capture", type=str, default="capture_{n}.csv",
+                        help="CSV file of a captured window, {n} is replaced by the capture number")
+    parser.add_argument("--rearm", action="store_true",
+                        help="Rearm the trigger after each capture")
     return parser
 
-
-import json
-
 # _______________Can be called as main__________________
 if __name__ == '__main__':
     
@@ -794,17 +1202,47 @@ if __name__ == '__main__':
 
     signal.signal(signal.SIGINT, signal.SIG_DFL)
 
-    uart2debug = UART2Debug(updateTime=args.updateTime)
+    uart2debug = UART2Debug(updateTime=args.updateTime, clkFreq=args.clk, useSnapshot=args.snapshot, port=args.port, baud=args.baud)
+    uart2debug.calibrate = not args.noCalibration
+    uart2debug.forceCalibration = args.calibrate
+    uart2debug.framed = args.framed
 
     if os.path.exists(args.cfg):
         uart2debug.setSignalConfigFromFile(args.cfg)
     else:
         uart2debug.setSignalConfig(testData)
 
+    # Memory dump without GUI
+    if args.dump is not None:
+        sel, start, count = (int(v, 0) for v in args.dump[:3])
+        if not uart2debug.connect(poll=False, timeout=5.0):
+            sys.exit(1)
+        t0 = time.perf_counter()
+        def dumpProgress(done, total):
+            rate = done*4/(time.perf_counter() - t0)/1024
+            print(f"\r{done}/{total} words ({rate:.1f} KiB/s)", end="", flush=True)
+        try:
+            res = uart2debug.dumpMemory(sel, start, count, out=args.dump[3], progress=dumpProgress)
+        except ValueError as e:
+            print(e)
+            res = None
+        print()
+        uart2debug.disconnect()
+        sys.exit(0 if res is not None else 1)
+
+    if args.trigger is not None:
+        try:
+            uart2debug.setTrigger(Trigger.expression(args.trigger, args.triggerSignals, preTrigger=args.preTrigger,
+                                                     postTrigger=args.postTrigger, captureFile=args.capture, rearm=args.rearm))
+        except (KeyError, TypeError, SyntaxError) as e:
+            print(f"Invalid trigger: {e}")
+            sys.exit(1)
 
 
 
-    app = QtWidgets.QApplication(sys.argv)
+    # Qt is only needed for the GUI, scripts import uart2bus without it
+    from uart2bus_gui import QApplication, MainWindow
+    app = QApplication(sys.argv)
 
 
     mw = MainWindow(uart2debug, args.updateTime)